@@ -2,15 +2,21 @@
 Support for interaction with Frontier Silicon Devices
 For example internet radios from: Medion, Hama, Auna, ...
 """
+import os
 import requests
 import logging
-import xml.etree.ElementTree as ET
-from typing import Any, Callable, Dict, List, Optional,\
-                   Tuple, Type, TypeVar, Union
+from urllib.parse import urlparse
+from lxml import etree as ET
+from typing import Any, Callable, Dict, Iterator, List, Optional,\
+                   Tuple, Type, TypeVar, Union, cast
+
+logger = logging.getLogger(__name__)
 
 A = TypeVar('A')
 B = TypeVar('B')
 DataItem = Union[str, int]
+# Query parameters may repeat (e.g. GET_MULTIPLE node lists)
+ParamData = Union[DataItem, List[str]]
 
 
 class FSAPI(object):
@@ -18,12 +24,30 @@ class FSAPI(object):
     DEFAULT_TIMEOUT_IN_SECONDS = 1
     DEFAULT_PIN = "1234"
 
-    PLAY_STATES = {
-        0: 'stopped',
-        1: 'unknown',
-        2: 'playing',
-        3: 'paused',
-    }
+    # One reusable parser instance, to skip parser setup on every response.
+    # Entity and network resolution are disabled: the radio never needs
+    # them, and skipping them is both faster and safer.
+    _PARSER = ET.XMLParser(resolve_entities=False, no_network=True)
+
+    # Precompiled XPath expressions for the single-value lookups on the
+    # hot path, compiled once instead of re-parsed per call.
+    _XP_STATUS = ET.XPath('status/text()')
+    _XP_SID = ET.XPath('sessionId/text()')
+    _XP_C8 = ET.XPath('value/c8_array/text()')
+    _XP_U8 = ET.XPath('value/u8/text()')
+    _XP_U32 = ET.XPath('value/u32/text()')
+    _XP_FIELD = ET.XPath('field[@name=$name]/c8_array/text()')
+
+    # Lazily compiled expressions for the dynamic keys given to unpack_xml
+    _xp_cache: Dict[str, ET.XPath] = {}
+
+    # Indexed by the netRemote.play.status value
+    PLAY_STATES = (
+        'stopped',
+        'unknown',
+        'playing',
+        'paused',
+    )
 
     def __init__(self,
                  fsapi_device_url: str,
@@ -34,20 +58,85 @@ class FSAPI(object):
         self.fsapi_device_url = fsapi_device_url
         self.timeout = timeout
 
+        # The valid-modes list is static for the session, so it is fetched
+        # once and indexed by key and label for O(1) lookup.
+        self._modes_cache: Optional[List[Dict[str,
+                                              Optional[DataItem]]]] = None
+        self._modes_by_key: Dict[str, Dict[str, Optional[DataItem]]] = {}
+        self._modes_by_label: Dict[str, Dict[str, Optional[DataItem]]] = {}
+
+        # Other netRemote.sys.caps.* values are also device-constant
+        self._volume_steps_cache: Optional[int] = None
+
+        # Keep one pooled connection alive across calls, as the radio is
+        # polled with many small GETs.
+        self._session = requests.Session()
+        self._session.mount('http://',
+                            requests.adapters.HTTPAdapter(pool_connections=1,
+                                                          pool_maxsize=4))
+        # The radio answers with small known-UTF-8 XML; asking for an
+        # uncompressed response skips pointless gzip inflation of sub-kB
+        # payloads.
+        self._session.headers.update({'Accept-Encoding': 'identity',
+                                      'Accept': 'application/xml'})
+
+        # Static per-session request pieces, built once instead of on
+        # every call.
+        self._base_params: Dict[str, ParamData] = {'pin': pin}
+
         self.webfsapi = self.get_fsapi_endpoint()
-        self.sid = self.create_session()
+        self._url_base = self.webfsapi.rstrip('/') + '/'
+
+        # Try the session ID persisted by a previous process before paying
+        # the CREATE_SESSION round trip; fall back if the radio rejects it.
+        # A persisted SID is deliberately kept alive on the device: it may
+        # be shared with other processes, and deleting it would defeat the
+        # reuse on the next start.
+        self._sid_persisted = False
+        self.sid = self._load_sid()
+        if self.sid is not None:
+            self._base_params['sid'] = self.sid
+            if self._verify_sid():
+                self._sid_persisted = True
+            else:
+                self.sid = None
+                del self._base_params['sid']
+        if self.sid is None:
+            self.sid = self.create_session()
+            if self.sid:
+                self._base_params['sid'] = self.sid
+                self._sid_persisted = self._save_sid()
 
     def __del__(self) -> None:
-        if self.sid is not None:
-            self.call('DELETE_SESSION')
+        # Don't re-enter the full call() machinery (XML parse, status
+        # checks) during teardown: fire the delete with a short timeout
+        # and swallow any failure, so __del__ can neither hang for the
+        # full call timeout nor raise at interpreter shutdown. Persisted
+        # SIDs are left alive for the next process to reuse.
+        if self.sid is not None and not self._sid_persisted:
+            try:
+                self._session.get(self._url_base + 'DELETE_SESSION',
+                                  params=self._base_params,
+                                  timeout=0.2)
+            except Exception:
+                pass
+        self._session.close()
+
+    @classmethod
+    def unpack_xml(cls, root: Optional[ET._Element], key: str)\
+            -> Optional[str]:
+        if root is None:
+            return None
+        xp = cls._xp_cache.get(key)
+        if xp is None:
+            xp = cls._xp_cache.setdefault(key, ET.XPath(key + '/text()'))
+        vals = cast(List[str], xp(root))
+        return vals[0] if vals else None
 
     @staticmethod
-    def unpack_xml(root: Optional[ET.Element], key: str) -> Optional[str]:
-        if root:
-            element = root.find(key)
-            if hasattr(element, "text"):
-                return str(element.text)  # type: ignore
-        return None
+    def first(vals: List[str]) -> Optional[str]:
+        """Return the first XPath result, or None if there were none."""
+        return vals[0] if vals else None
 
     @staticmethod
     def maybe(val: Optional[A],
@@ -58,8 +147,8 @@ class FSAPI(object):
 
     def get_fsapi_endpoint(self) -> str:
         try:
-            endpoint = requests.get(self.fsapi_device_url,
-                                    timeout=self.timeout)
+            endpoint = self._session.get(self.fsapi_device_url,
+                                         timeout=self.timeout)
         except requests.exceptions.Timeout:
             raise TimeoutError("FSAPI could not get a response from {}"
                                .format(self.fsapi_device_url))
@@ -67,7 +156,7 @@ class FSAPI(object):
             raise ConnectionError("FSAPI could not connect to {}"
                                   .format(self.fsapi_device_url))
 
-        doc = ET.fromstring(endpoint.content)
+        doc = ET.fromstring(endpoint.content, self._PARSER)
         api = doc.find("webfsapi")
         if api is not None and api.text:
             return api.text
@@ -76,96 +165,255 @@ class FSAPI(object):
                                          .format(self.fsapi_device_url))
 
     def create_session(self) -> Optional[str]:
-        return self.unpack_xml(self.call('CREATE_SESSION'), "sessionId")
+        doc = self.call('CREATE_SESSION')
+        return self.first(cast(List[str], self._XP_SID(doc)))\
+            if doc is not None else None
+
+    def _sid_cache_path(self) -> str:
+        cache_dir = os.path.join(
+            os.environ.get('XDG_CACHE_HOME',
+                           os.path.expanduser('~/.cache')), 'fsapi')
+        host = urlparse(self.fsapi_device_url).netloc.replace(':', '_')
+        return os.path.join(cache_dir, (host or 'device') + '.sid')
+
+    def _load_sid(self) -> Optional[str]:
+        try:
+            with open(self._sid_cache_path()) as cache:
+                return cache.read().strip() or None
+        except OSError:
+            return None
+
+    def _save_sid(self) -> bool:
+        if not self.sid:
+            return False
+        path = self._sid_cache_path()
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, 'w') as cache:
+                cache.write(self.sid)
+            return True
+        except OSError:
+            # Caching is best-effort; the session still works without it
+            return False
+
+    def _verify_sid(self) -> bool:
+        try:
+            return self.handle_get('netRemote.sys.power') is not None
+        except (PermissionError, NotImplementedError):
+            return False
+
+    def _build_params(self,
+                      extra: Optional[Dict[str, ParamData]] = None)\
+            -> Dict[str, ParamData]:
+        if extra is None:
+            return self._base_params
+        return {**self._base_params, **extra}
 
     def call(self,
              path: str,
-             extra: Optional[Dict[str, DataItem]] = None)\
-            -> Optional[ET.Element]:
+             extra: Optional[Dict[str, ParamData]] = None)\
+            -> Optional[ET._Element]:
         """Execute a frontier silicon API call."""
         if not self.webfsapi:
             raise RuntimeError("FSAPI not successfully initialised.")
 
-        params: Dict[str, DataItem] = dict(pin=self.pin)
-        if self.sid:
-            params.update(sid=self.sid)
-        if extra is not None:
-            params.update(**extra)
-
-        result = requests.get('%s/%s' % (self.webfsapi, path),
-                              params=params,
-                              timeout=self.timeout)
+        result = self._session.get(self._url_base + path,
+                                   params=self._build_params(extra),
+                                   timeout=self.timeout,
+                                   stream=True)
         if result.status_code == 403:
+            result.close()
             raise PermissionError("FSAPI access denied - incorrect PIN")
         if result.status_code == 404:
             # Bad session ID or service endpoint
-            logging.warn("FSAPI service call failed to %s/%s"
-                         % (self.webfsapi, path))
+            result.close()
+            logger.warning("FSAPI service call failed to %s/%s",
+                           self.webfsapi, path)
             return None
 
-        doc = ET.fromstring(result.content)
-        status = self.unpack_xml(doc, "status")
+        # Parse straight from the socket rather than materialising the
+        # body bytes first and re-reading them for the parser.
+        result.raw.decode_content = True
+        doc = ET.parse(result.raw, self._PARSER).getroot()
+        status = self.first(cast(List[str], self._XP_STATUS(doc)))
         if status == "FS_NODE_DOES_NOT_EXIST":
             raise NotImplementedError("FSAPI service %s not implemented at %s."
                                       % (path, self.webfsapi))
         if status == "FS_OK":
             return doc
 
-        logging.warn("Unexpected FSAPI status %s" % status)
+        logger.warning("Unexpected FSAPI status %s", status)
         return None
 
     # Handlers
 
-    def handle_get(self, item: str) -> Optional[ET.Element]:
-        return self.call('GET/{}'.format(item))
+    def handle_get(self, item: str) -> Optional[ET._Element]:
+        return self.call(f'GET/{item}')
 
     def handle_set(self, item: str, value: Any) -> Optional[bool]:
-        status = self.unpack_xml(self.call('SET/{}'.format(item),
-                                 dict(value=value)), "status")
-        return self.maybe(status, lambda x: x == 'FS_OK')
+        doc = self.call(f'SET/{item}', dict(value=value))
+        if doc is None:
+            return None
+        return self.first(cast(List[str],
+                               self._XP_STATUS(doc))) == 'FS_OK'
 
     def handle_text(self, item: str) -> Optional[str]:
-        return self.unpack_xml(self.handle_get(item), "value/c8_array")
+        doc = self.handle_get(item)
+        return self.first(cast(List[str], self._XP_C8(doc)))\
+            if doc is not None else None
 
     def handle_int(self, item: str) -> Optional[int]:
-        val = self.unpack_xml(self.handle_get(item), "value/u8")
-        return self.maybe(val, int)
+        doc = self.handle_get(item)
+        if doc is None:
+            return None
+        vals = cast(List[str], self._XP_U8(doc))
+        return int(vals[0]) if vals else None
 
     # returns an int, assuming the value does not exceed 8 bits
     def handle_long(self, item: str) -> Optional[int]:
-        val = self.unpack_xml(self.handle_get(item), "value/u32")
-        return self.maybe(val, int)
+        doc = self.handle_get(item)
+        if doc is None:
+            return None
+        vals = cast(List[str], self._XP_U32(doc))
+        return int(vals[0]) if vals else None
+
+    @classmethod
+    def handle_field(cls, field: ET._Element) -> Tuple[str,
+                                                       Optional[DataItem]]:
+        # TODO: Handle other field types
+        if 'name' in field.attrib:
+            id = cast(str, field.attrib['name'])
+            s = cls.unpack_xml(field, 'c8_array')
+            v = cls.maybe(cls.unpack_xml(field, 'u8'), int)
+            return (id, s or v)
+        return ("", None)
+
+    @classmethod
+    def handle_item(cls, item: ET._Element) -> Dict[str, Optional[DataItem]]:
+        ret = dict(map(cls.handle_field, item.findall('field')))
+        if 'key' in item.attrib:
+            ret['key'] = cast(str, item.attrib['key'])
+        return ret
+
+    def _stream_list(self, item: str) -> Iterator[ET._Element]:
+        """Yield the <item> elements of a LIST_GET_NEXT response.
+
+        Stream-parses straight from the socket, discarding each <item>
+        subtree once the consumer has read it, so the full list DOM is
+        never resident. Elements are only valid until the next iteration.
+        """
+        if not self.webfsapi:
+            raise RuntimeError("FSAPI not successfully initialised.")
 
-    def handle_list(self, item: str) -> List[Dict[str, Optional[DataItem]]]:
-        def handle_field(field: ET.Element) -> Tuple[str, Optional[DataItem]]:
-            # TODO: Handle other field types
-            if 'name' in field.attrib:
-                id = field.attrib['name']
-                s = self.unpack_xml(field, 'c8_array')
-                v = self.maybe(self.unpack_xml(field, 'u8'), int)
-                return (id, s or v)
-            return ("", None)
-
-        def handle_item(item: ET.Element) -> Dict[str, Optional[DataItem]]:
-            ret = dict(map(handle_field, item.findall('field')))
-            if 'key' in item.attrib:
-                ret['key'] = item.attrib['key']
-            return ret
-
-        doc = self.call('LIST_GET_NEXT/'+item+'/-1', dict(
-            maxItems=100,
-        ))
+        path = 'LIST_GET_NEXT/'+item+'/-1'
+        result = self._session.get(self._url_base + path,
+                                   params=self._build_params(dict(
+                                       maxItems=100,
+                                   )),
+                                   timeout=self.timeout,
+                                   stream=True)
+        if result.status_code == 403:
+            result.close()
+            raise PermissionError("FSAPI access denied - incorrect PIN")
+        if result.status_code == 404:
+            # Bad session ID or service endpoint
+            result.close()
+            logger.warning("FSAPI service call failed to %s/%s",
+                           self.webfsapi, path)
+            return
 
-        if doc is None:
-            return []
+        result.raw.decode_content = True
+        status = None
+        try:
+            for _, elem in ET.iterparse(result.raw, tag=('status', 'item')):
+                if elem.tag == 'status':
+                    # The status element precedes the items on the wire
+                    status = elem.text
+                    if status == "FS_NODE_DOES_NOT_EXIST":
+                        raise NotImplementedError(
+                            "FSAPI service %s not implemented at %s."
+                            % (path, self.webfsapi))
+                elif status == 'FS_OK':
+                    yield elem
+                elem.clear()
+                while elem.getprevious() is not None:
+                    del elem.getparent()[0]
+        finally:
+            # Release the pooled connection even if the consumer abandons
+            # the iterator early or the parse fails mid-stream
+            result.close()
 
-        status = self.unpack_xml(doc, "status")
-        if not status == 'FS_OK':
-            return []
+    def handle_list(self, item: str) -> List[Dict[str, Optional[DataItem]]]:
+        return [self.handle_item(elem) for elem in self._stream_list(item)]
+
+    def iter_list_field(self, item: str, field_name: str)\
+            -> Iterator[Optional[str]]:
+        """Yield one named field per list item, without building dicts."""
+        for elem in self._stream_list(item):
+            yield self.first(cast(List[str],
+                                  self._XP_FIELD(elem, name=field_name)))
+
+    def get_many(self, nodes: List[str])\
+            -> Dict[str, Optional[ET._Element]]:
+        """Fetch several nodes in a single GET_MULTIPLE round trip."""
+        if not self.webfsapi:
+            raise RuntimeError("FSAPI not successfully initialised.")
 
-        return list(map(handle_item, doc.findall('item')))
+        result = self._session.get(self._url_base + 'GET_MULTIPLE',
+                                   params=self._build_params(dict(
+                                       node=nodes,
+                                   )),
+                                   timeout=self.timeout)
+        if result.status_code == 403:
+            raise PermissionError("FSAPI access denied - incorrect PIN")
+        if result.status_code == 404:
+            # Bad session ID or service endpoint
+            logger.warning("FSAPI service call failed to %s/GET_MULTIPLE",
+                           self.webfsapi)
+            return {}
+
+        doc = ET.fromstring(result.content, self._PARSER)
+        return self.parse_get_multiple(doc)
+
+    @classmethod
+    def parse_get_multiple(cls, doc: ET._Element)\
+            -> Dict[str, Optional[ET._Element]]:
+        """Map each FS_OK node of a GET_MULTIPLE response to its value."""
+        values: Dict[str, Optional[ET._Element]] = {}
+        for response in doc.findall('fsapiResponse'):
+            node = response.get('node') or cls.unpack_xml(response, 'node')
+            if node and cls.unpack_xml(response, 'status') == 'FS_OK':
+                values[node] = response.find('value')
+        return values
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Fetch the commonly-polled state in one GET_MULTIPLE round trip."""
+        values = self.get_many(['netRemote.play.status',
+                                'netRemote.play.info.name',
+                                'netRemote.play.info.text',
+                                'netRemote.sys.audio.volume',
+                                'netRemote.sys.audio.mute',
+                                'netRemote.sys.power'])
+
+        def int_value(node: str) -> Optional[int]:
+            return self.maybe(self.unpack_xml(values.get(node), 'u8'), int)
+
+        status = int_value('netRemote.play.status')
+        return {
+            'play_status': self.PLAY_STATES[status]
+            if status is not None and 0 <= status < len(self.PLAY_STATES)
+            else None,
+            'play_info_name': self.unpack_xml(
+                values.get('netRemote.play.info.name'), 'c8_array'),
+            'play_info_text': self.unpack_xml(
+                values.get('netRemote.play.info.text'), 'c8_array'),
+            'volume': int_value('netRemote.sys.audio.volume'),
+            'mute': bool(int_value('netRemote.sys.audio.mute')),
+            'power': bool(int_value('netRemote.sys.power')),
+        }
 
-    def collect_labels(self, items: List[Dict[str, Any]]) -> List[str]:
+    @staticmethod
+    def collect_labels(items: List[Dict[str, Any]]) -> List[str]:
         if items is None:
             return []
 
@@ -175,8 +423,8 @@ class FSAPI(object):
     @property
     def play_status(self) -> Optional[str]:
         status = self.handle_int('netRemote.play.status')
-        if status is not None:
-            return self.PLAY_STATES.get(status)
+        if status is not None and 0 <= status < len(self.PLAY_STATES):
+            return self.PLAY_STATES[status]
         return None
 
     @property
@@ -201,7 +449,10 @@ class FSAPI(object):
 
     @property
     def volume_steps(self) -> Optional[int]:
-        return self.handle_int('netRemote.sys.caps.volumeSteps')
+        if self._volume_steps_cache is None:
+            self._volume_steps_cache = self.handle_int(
+                'netRemote.sys.caps.volumeSteps')
+        return self._volume_steps_cache
 
     # Read-write
 
@@ -260,30 +511,43 @@ class FSAPI(object):
     # Modes
     @property
     def modes(self) -> List[Dict[str, Optional[DataItem]]]:
-        return self.handle_list('netRemote.sys.caps.validModes')
+        if self._modes_cache is None:
+            items = self.handle_list('netRemote.sys.caps.validModes')
+            if not items:
+                # Don't cache a failed fetch
+                return items
+            self._modes_cache = items
+            self._modes_by_key = {str(item['key']): item
+                                  for item in items if 'key' in item}
+            self._modes_by_label = {str(item['label']): item
+                                    for item in items if item.get('label')}
+        return self._modes_cache
 
     @property
     def mode_list(self) -> List[str]:
-        return self.collect_labels(self.modes)
+        if self._modes_cache is not None:
+            return self.collect_labels(self._modes_cache)
+        # Cache is cold: read just the label field while streaming, rather
+        # than building the full per-item dicts.
+        return [label for label in self.iter_list_field(
+            'netRemote.sys.caps.validModes', 'label') if label]
 
     @property
     def mode(self) -> str:
         mode = None
         int_mode = self.handle_long('netRemote.sys.mode')
-        if int_mode is not None:
-            for temp_mode in self.modes:
-                if temp_mode['key'] == str(int_mode):
-                    mode = temp_mode['label']
+        if int_mode is not None and self.modes:
+            temp_mode = self._modes_by_key.get(str(int_mode))
+            if temp_mode is not None:
+                mode = temp_mode['label']
         return str(mode)
 
     @mode.setter
     def mode(self, value: str) -> None:
-        for temp_mode in self.modes:
-            if 'label' in temp_mode and 'key' in temp_mode:
-                if temp_mode['label'] == value:
-                    mode = temp_mode['key']
-                    if mode is not None:
-                        self.handle_set('netRemote.sys.mode', mode)
+        if self.modes:
+            temp_mode = self._modes_by_label.get(value)
+            if temp_mode is not None and temp_mode.get('key') is not None:
+                self.handle_set('netRemote.sys.mode', temp_mode['key'])
 
     @property
     def duration(self) -> Optional[int]:
@@ -0,0 +1,274 @@
+"""
+Asyncio support for interaction with Frontier Silicon Devices
+Allows independent API calls to be issued concurrently, e.g. with
+asyncio.gather, instead of serially as in the blocking FSAPI class.
+"""
+import asyncio
+import aiohttp
+import logging
+from lxml import etree as ET
+from typing import Any, Dict, List, Optional
+
+from . import FSAPI, DataItem
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncFSAPI(object):
+
+    DEFAULT_TIMEOUT_IN_SECONDS = FSAPI.DEFAULT_TIMEOUT_IN_SECONDS
+    DEFAULT_PIN = FSAPI.DEFAULT_PIN
+
+    PLAY_STATES = FSAPI.PLAY_STATES
+
+    # One reusable parser instance, to skip parser setup on every response
+    _PARSER = ET.XMLParser(huge_tree=False, recover=False)
+
+    def __init__(self,
+                 fsapi_device_url: str,
+                 pin: str = DEFAULT_PIN,
+                 timeout: int = DEFAULT_TIMEOUT_IN_SECONDS):
+        self.pin = pin
+        self.sid: Optional[str] = None
+        self.fsapi_device_url = fsapi_device_url
+        self.timeout = timeout
+        self.webfsapi: Optional[str] = None
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    @classmethod
+    async def create(cls,
+                     fsapi_device_url: str,
+                     pin: str = DEFAULT_PIN,
+                     timeout: int = DEFAULT_TIMEOUT_IN_SECONDS)\
+            -> 'AsyncFSAPI':
+        """Connect to a device and return a ready-to-use AsyncFSAPI."""
+        self = cls(fsapi_device_url, pin, timeout)
+        self._session = aiohttp.ClientSession(
+            timeout=aiohttp.ClientTimeout(total=self.timeout))
+        try:
+            self.webfsapi = await self.get_fsapi_endpoint()
+            self.sid = await self.create_session()
+        except BaseException:
+            # Don't leak the client session when the device is unreachable
+            await self._session.close()
+            raise
+        return self
+
+    async def close(self) -> None:
+        try:
+            if self.sid is not None:
+                await self.call('DELETE_SESSION')
+                self.sid = None
+        finally:
+            if self._session is not None:
+                await self._session.close()
+
+    async def __aenter__(self) -> 'AsyncFSAPI':
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        await self.close()
+
+    async def get_fsapi_endpoint(self) -> str:
+        assert self._session is not None
+        try:
+            async with self._session.get(self.fsapi_device_url) as endpoint:
+                content = await endpoint.read()
+        except asyncio.TimeoutError:
+            raise TimeoutError("FSAPI could not get a response from {}"
+                               .format(self.fsapi_device_url))
+        except aiohttp.ClientError:
+            raise ConnectionError("FSAPI could not connect to {}"
+                                  .format(self.fsapi_device_url))
+
+        doc = ET.fromstring(content, self._PARSER)
+        api = doc.find("webfsapi")
+        if api is not None and api.text:
+            return api.text
+        else:
+            raise ConnectionRefusedError("FSAPI endpoint not found at {}"
+                                         .format(self.fsapi_device_url))
+
+    async def create_session(self) -> Optional[str]:
+        return FSAPI.unpack_xml(await self.call('CREATE_SESSION'),
+                                "sessionId")
+
+    async def call(self,
+                   path: str,
+                   extra: Optional[Dict[str, DataItem]] = None)\
+            -> Optional[ET._Element]:
+        """Execute a frontier silicon API call."""
+        if not self.webfsapi or self._session is None:
+            raise RuntimeError("FSAPI not successfully initialised.")
+
+        params: Dict[str, DataItem] = {'pin': self.pin, **(extra or {})}
+        if self.sid:
+            params['sid'] = self.sid
+
+        async with self._session.get('%s/%s' % (self.webfsapi, path),
+                                     params=params) as result:
+            if result.status == 403:
+                raise PermissionError("FSAPI access denied - incorrect PIN")
+            if result.status == 404:
+                # Bad session ID or service endpoint
+                logger.warning("FSAPI service call failed to %s/%s",
+                               self.webfsapi, path)
+                return None
+            content = await result.read()
+
+        doc = ET.fromstring(content, self._PARSER)
+        status = FSAPI.unpack_xml(doc, "status")
+        if status == "FS_NODE_DOES_NOT_EXIST":
+            raise NotImplementedError("FSAPI service %s not implemented at %s."
+                                      % (path, self.webfsapi))
+        if status == "FS_OK":
+            return doc
+
+        logger.warning("Unexpected FSAPI status %s", status)
+        return None
+
+    # Handlers
+
+    async def handle_get(self, item: str) -> Optional[ET._Element]:
+        return await self.call(f'GET/{item}')
+
+    async def handle_set(self, item: str, value: Any) -> Optional[bool]:
+        status = FSAPI.unpack_xml(await self.call(f'SET/{item}',
+                                  dict(value=value)), "status")
+        return FSAPI.maybe(status, lambda x: x == 'FS_OK')
+
+    async def handle_text(self, item: str) -> Optional[str]:
+        return FSAPI.unpack_xml(await self.handle_get(item),
+                                "value/c8_array")
+
+    async def handle_int(self, item: str) -> Optional[int]:
+        val = FSAPI.unpack_xml(await self.handle_get(item), "value/u8")
+        return FSAPI.maybe(val, int)
+
+    # returns an int, assuming the value does not exceed 8 bits
+    async def handle_long(self, item: str) -> Optional[int]:
+        val = FSAPI.unpack_xml(await self.handle_get(item), "value/u32")
+        return FSAPI.maybe(val, int)
+
+    async def handle_list(self, item: str)\
+            -> List[Dict[str, Optional[DataItem]]]:
+        doc = await self.call('LIST_GET_NEXT/'+item+'/-1', dict(
+            maxItems=100,
+        ))
+
+        if doc is None:
+            return []
+
+        status = FSAPI.unpack_xml(doc, "status")
+        if not status == 'FS_OK':
+            return []
+
+        return list(map(FSAPI.handle_item, doc.findall('item')))
+
+    # Read-only accessors; coroutines instead of the blocking properties
+
+    async def play_status(self) -> Optional[str]:
+        status = await self.handle_int('netRemote.play.status')
+        if status is not None and 0 <= status < len(self.PLAY_STATES):
+            return self.PLAY_STATES[status]
+        return None
+
+    async def play_info_name(self) -> Optional[str]:
+        return await self.handle_text('netRemote.play.info.name')
+
+    async def play_info_text(self) -> Optional[str]:
+        return await self.handle_text('netRemote.play.info.text')
+
+    async def play_info_artist(self) -> Optional[str]:
+        return await self.handle_text('netRemote.play.info.artist')
+
+    async def play_info_album(self) -> Optional[str]:
+        return await self.handle_text('netRemote.play.info.album')
+
+    async def play_info_graphics(self) -> Optional[str]:
+        return await self.handle_text('netRemote.play.info.graphicUri')
+
+    async def volume_steps(self) -> Optional[int]:
+        return await self.handle_int('netRemote.sys.caps.volumeSteps')
+
+    async def duration(self) -> Optional[int]:
+        return await self.handle_long('netRemote.play.info.duration')
+
+    # Read-write
+
+    # 1=Play; 2=Pause; 3=Next (song/station); 4=Previous (song/station)
+    async def play_control(self, value: int) -> Optional[bool]:
+        return await self.handle_set('netRemote.play.control', value)
+
+    async def play(self) -> Optional[bool]:
+        return await self.play_control(1)
+
+    async def pause(self) -> Optional[bool]:
+        return await self.play_control(2)
+
+    async def forward(self) -> Optional[bool]:
+        return await self.play_control(3)
+
+    async def rewind(self) -> Optional[bool]:
+        return await self.play_control(4)
+
+    # Volume
+    async def volume(self) -> Optional[int]:
+        return await self.handle_int('netRemote.sys.audio.volume')
+
+    async def set_volume(self, value: int) -> Optional[bool]:
+        return await self.handle_set('netRemote.sys.audio.volume', value)
+
+    # Friendly name
+    async def friendly_name(self) -> Optional[str]:
+        return await self.handle_text('netRemote.sys.info.friendlyName')
+
+    async def set_friendly_name(self, value: Any) -> Optional[bool]:
+        return await self.handle_set('netRemote.sys.info.friendlyName', value)
+
+    # Mute
+    async def mute(self) -> bool:
+        return bool(await self.handle_int('netRemote.sys.audio.mute'))
+
+    async def set_mute(self, value: Any = False) -> Optional[bool]:
+        return await self.handle_set('netRemote.sys.audio.mute', int(value))
+
+    # Power
+    async def power(self) -> bool:
+        return bool(await self.handle_int('netRemote.sys.power'))
+
+    async def set_power(self, value: Any = False) -> Optional[bool]:
+        return await self.handle_set('netRemote.sys.power', int(value))
+
+    # Modes
+    async def modes(self) -> List[Dict[str, Optional[DataItem]]]:
+        return await self.handle_list('netRemote.sys.caps.validModes')
+
+    async def mode_list(self) -> List[str]:
+        return FSAPI.collect_labels(await self.modes())
+
+    async def mode(self) -> str:
+        mode = None
+        int_mode, modes = await asyncio.gather(
+            self.handle_long('netRemote.sys.mode'), self.modes())
+        if int_mode is not None:
+            for temp_mode in modes:
+                if temp_mode['key'] == str(int_mode):
+                    mode = temp_mode['label']
+        return str(mode)
+
+    async def set_mode(self, value: str) -> None:
+        for temp_mode in await self.modes():
+            if 'label' in temp_mode and 'key' in temp_mode:
+                if temp_mode['label'] == value:
+                    mode = temp_mode['key']
+                    if mode is not None:
+                        await self.handle_set('netRemote.sys.mode', mode)
+
+    async def snapshot(self) -> Dict[str, Any]:
+        """Fetch the commonly-polled state in concurrent API calls."""
+        keys = ('play_status', 'play_info_name', 'play_info_text',
+                'volume', 'mute', 'power')
+        values = await asyncio.gather(*(getattr(self, key)()
+                                        for key in keys))
+        return dict(zip(keys, values))
@@ -1,5 +1,5 @@
 import pytest
-import xml.etree.ElementTree as ET
+from lxml import etree as ET
 from fsapi import FSAPI
 
 
@@ -12,6 +12,27 @@ def xml_test_data():
         </fsapiResponse>')
 
 
+@pytest.fixture
+def xml_multiple_data():
+    return ET.fromstring('<fsapiGetMultipleResponse>\
+        <fsapiResponse>\
+        <node>netRemote.sys.audio.volume</node>\
+        <status>FS_OK</status>\
+        <value><u8>7</u8></value>\
+        </fsapiResponse>\
+        <fsapiResponse>\
+        <node>netRemote.play.info.name</node>\
+        <status>FS_OK</status>\
+        <value><c8_array>My Radio</c8_array></value>\
+        </fsapiResponse>\
+        <fsapiResponse>\
+        <node>netRemote.sys.power</node>\
+        <status>FS_NODE_BLOCKED</status>\
+        <value><u8>1</u8></value>\
+        </fsapiResponse>\
+        </fsapiGetMultipleResponse>')
+
+
 class TestHelperMethods():
 
     def test_unpack_xml_handles_l1_value(self, xml_test_data):
@@ -23,6 +44,12 @@ class TestHelperMethods():
     def test_unpack_xml_handles_None(self, xml_test_data):
         assert FSAPI.unpack_xml(None, 'status') is None
 
+    def test_first_returns_first_result(self):
+        assert FSAPI.first(['a', 'b']) == 'a'
+
+    def test_first_handles_empty(self):
+        assert FSAPI.first([]) is None
+
     def test_maybe_handles_None(self):
         assert FSAPI.maybe(None, int) is None
 
@@ -31,3 +58,21 @@ class TestHelperMethods():
 
     def test_maybe_accepts_lambda(self):
         assert FSAPI.maybe(1, lambda x: str(x)) == "1"
+
+
+class TestGetMultipleParsing():
+
+    def test_parse_get_multiple_extracts_values(self, xml_multiple_data):
+        values = FSAPI.parse_get_multiple(xml_multiple_data)
+        assert FSAPI.unpack_xml(values['netRemote.sys.audio.volume'],
+                                'u8') == '7'
+        assert FSAPI.unpack_xml(values['netRemote.play.info.name'],
+                                'c8_array') == 'My Radio'
+
+    def test_parse_get_multiple_skips_bad_status(self, xml_multiple_data):
+        values = FSAPI.parse_get_multiple(xml_multiple_data)
+        assert 'netRemote.sys.power' not in values
+
+    def test_parse_get_multiple_handles_empty(self):
+        doc = ET.fromstring('<fsapiGetMultipleResponse/>')
+        assert FSAPI.parse_get_multiple(doc) == {}